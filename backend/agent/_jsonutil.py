@@ -0,0 +1,52 @@
+from typing import Any, Dict, Optional
+import json_repair
+import orjson
+
+def pretty(obj: Any) -> str:
+    """
+    Indented JSON for prompts. orjson never escapes non-ASCII, so this matches
+    json.dumps(obj, ensure_ascii=False, indent=2) at a fraction of the cost.
+    """
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+
+def compact(obj: Any) -> str:
+    """Single-line JSON, for when the payload only needs to be machine-readable."""
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+def _leading_object(text: str) -> Any:
+    """
+    Parse the first complete {...} in text, ignoring whatever follows it. orjson does the
+    brace/string matching: on trailing prose its error position marks where the object ended.
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+    text = text[start:]
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError as e:
+        if not 0 < e.pos < len(text):
+            return None
+        try:
+            return orjson.loads(text[:e.pos])
+        except orjson.JSONDecodeError:
+            return None
+
+def parse_tolerant(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse the JSON object in a raw model response. orjson on the first balanced {...}
+    first, which covers valid JSON wrapped in code fences or prose; only then the slower
+    json_repair, which recovers from trailing commas, truncation, etc.
+    Returns None when no object can be recovered.
+    """
+    text = (text or "").strip()
+    data = _leading_object(text)
+    if data is None:
+        try:
+            data = json_repair.loads(text)
+        except Exception:
+            return None
+    # Several objects in one response come back as a list; the first one is the answer
+    if isinstance(data, list):
+        data = next((d for d in data if isinstance(d, dict)), None)
+    return data if isinstance(data, dict) else None
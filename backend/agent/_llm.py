@@ -0,0 +1,159 @@
+import asyncio
+import itertools
+import os
+import weakref
+from functools import lru_cache
+from typing import Any, AsyncIterator, List
+from langchain.schema import SystemMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_groq import ChatGroq
+
+from agent._resilience import llm_breaker, retry_transient
+from cache.llm_cache import cache_key, llm_cache
+
+# LangChain chat-model types that honour Anthropic-style cache_control breakpoints
+_CACHE_CONTROL_LLM_TYPES = {"anthropic-chat", "amazon_bedrock_chat"}
+
+class LLMPool:
+    """
+    Round-robin over several chat clients (one per API key) behind the ainvoke/astream
+    interface call_llm and stream_llm use, so per-key rate limits add up. In-flight calls
+    are capped at per_client_limit * len(clients).
+    """
+
+    def __init__(self, clients: List[Any], per_client_limit: int = 4):
+        self.clients = list(clients)
+        self.limit = per_client_limit * len(self.clients)
+        self._next = itertools.cycle(self.clients)
+        # Semaphores bind to an event loop; run_orchestrator starts a new loop per call
+        self._slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+        # Identity used by the response cache and cache_control detection
+        first = self.clients[0]
+        self.model_name = getattr(first, "model_name", None) or getattr(first, "model", "")
+        self.temperature = getattr(first, "temperature", "")
+        self._llm_type = getattr(first, "_llm_type", "")
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        slots = self._slots.get(loop)
+        if slots is None:
+            slots = self._slots[loop] = asyncio.Semaphore(self.limit)
+        return slots
+
+    async def ainvoke(self, messages: Any, **kwargs: Any) -> Any:
+        async with self._semaphore():
+            return await next(self._next).ainvoke(messages, **kwargs)
+
+    async def astream(self, messages: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        async with self._semaphore():
+            async for chunk in next(self._next).astream(messages, **kwargs):
+                yield chunk
+
+# Deterministic sampling: structured output, and repeat prompts are safe to serve from cache
+_TEMPERATURE = 0.0
+
+@lru_cache(maxsize=1)
+def _default_model() -> str:
+    return os.environ.get("GROQ_MODEL", "llama3-8b-8192")
+
+@lru_cache(maxsize=1)
+def get_llm() -> Any:
+    """
+    Process-wide default chat model. Environment (GROQ_MODEL, GROQ_API_KEYS or
+    GROQ_API_KEY) is read on the first call, so a .env loaded at startup is picked up.
+    Several comma-separated GROQ_API_KEYS give an LLMPool with one client per key.
+    """
+    keys = [k.strip() for k in os.environ.get("GROQ_API_KEYS", "").split(",") if k.strip()]
+    if not keys and os.environ.get("GROQ_API_KEY"):
+        keys = [os.environ["GROQ_API_KEY"]]
+    if not keys:
+        raise RuntimeError("GROQ_API_KEY is not set in environment.")
+    # max_retries=0: call_llm's retry_transient owns retries, the SDK's own would multiply them
+    clients = [
+        ChatGroq(model=_default_model(), temperature=_TEMPERATURE, groq_api_key=k, max_retries=0)
+        for k in keys
+    ]
+    if len(clients) == 1:
+        return clients[0]
+    per_key = int(os.environ.get("GROQ_MAX_CONCURRENCY_PER_KEY", "4"))
+    return LLMPool(clients, per_client_limit=per_key)
+
+def llm_from_config(config: RunnableConfig) -> Any:
+    """
+    The chat model for the current run. It travels in config["configurable"]["llm"] rather
+    than in graph state, so state merges don't carry the client around.
+    """
+    return config["configurable"]["llm"]
+
+def _system_message(llm: Any, system_prompt: str) -> SystemMessage:
+    """
+    Mark the static system prompt as a cacheable prefix where the provider supports
+    explicit breakpoints. OpenAI-compatible providers (Groq included) cache identical
+    prefixes automatically, so plain text is enough there.
+    """
+    if getattr(llm, "_llm_type", "") in _CACHE_CONTROL_LLM_TYPES:
+        return SystemMessage(content=[
+            {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}
+        ])
+    return SystemMessage(content=system_prompt)
+
+def _model_name(llm: Any) -> str:
+    return str(getattr(llm, "model_name", None) or getattr(llm, "model", ""))
+
+def llm_identity(llm: Any) -> str:
+    """Model and sampling temperature of llm; responses are only reusable under the same identity."""
+    temperature = getattr(llm, "temperature", "")
+    if isinstance(temperature, (int, float)):
+        # ChatGroq stores temperature 0 as 1e-8; rounding keeps both spellings one identity
+        temperature = round(float(temperature), 4)
+    return f"{_model_name(llm)}@{temperature}"
+
+def default_llm_identity() -> str:
+    """llm_identity(get_llm()) without building a client, so it needs no API key."""
+    return f"{_default_model()}@{round(_TEMPERATURE, 4)}"
+
+def _cache_key(llm: Any, system_prompt: str, user_prompt: str) -> str:
+    return cache_key(_model_name(llm), str(getattr(llm, "temperature", "")), system_prompt, user_prompt)
+
+@llm_breaker
+@retry_transient
+async def _ainvoke(llm: Any, messages: List[Any]) -> Any:
+    return await llm.ainvoke(messages)
+
+async def call_llm(llm: Any, system_prompt: str, user_prompt: str, use_cache: bool = True) -> str:
+    """
+    Shared LLM call for all agents. Keep system_prompt fully static and put per-task
+    content in user_prompt so the prompt prefix stays cacheable across calls.
+
+    Transient provider errors (429, 5xx, timeouts) are retried with backoff before the
+    llm circuit breaker counts a failure.
+
+    Identical prompts are answered from the disk cache (cache.llm_cache, 24h TTL). Pass
+    use_cache=False on retries that must reach the model again; the fresh answer still
+    refreshes the cache.
+    """
+    key = _cache_key(llm, system_prompt, user_prompt)
+    if use_cache:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+
+    msg = await _ainvoke(llm, [_system_message(llm, system_prompt), HumanMessage(content=user_prompt)])
+    content = msg.content.strip()
+    llm_cache.set(key, content)
+    return content
+
+# Not retried: tokens already streamed to the caller can't be taken back
+@llm_breaker
+async def stream_llm(llm: Any, system_prompt: str, user_prompt: str) -> str:
+    """
+    Like call_llm but generates with llm.astream, so graph runs using stream_mode="messages"
+    see tokens as they arrive. Returns the full text; streamed output is not cached.
+    """
+    messages = [_system_message(llm, system_prompt), HumanMessage(content=user_prompt)]
+    parts = []
+    async for chunk in llm.astream(messages):
+        parts.append(chunk.content)
+    return "".join(parts).strip()
@@ -0,0 +1,19 @@
+import logging
+from collections import deque
+from typing import Any, Deque, Dict
+
+# Most recent lines kept in state["logs"]; older ones only reach the logger
+MAX_LOG_LINES = 200
+
+logger = logging.getLogger("orchestrator")
+
+def new_log_buffer() -> Deque[str]:
+    return deque(maxlen=MAX_LOG_LINES)
+
+def append_log(state: Dict[str, Any], line: str) -> None:
+    """
+    Record a progress line. state["logs"] is a bounded deque appended in place, so long
+    review loops can't grow it without limit; every line also goes to the logger.
+    """
+    logger.info(line)
+    state.setdefault("logs", new_log_buffer()).append(line)
@@ -0,0 +1,128 @@
+import asyncio
+import functools
+import time
+from typing import Any, Callable, Optional
+import aiohttp
+import groq
+import requests
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+
+def error_status(exc: BaseException) -> Optional[int]:
+    # Groq/OpenAI SDK errors expose status_code; requests/aiohttp errors carry a response/status
+    status = getattr(exc, "status_code", None) or getattr(exc, "status", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+_NETWORK_ERRORS = (
+    requests.ConnectionError,
+    aiohttp.ClientConnectionError,
+    groq.APIConnectionError,  # includes groq.APITimeoutError
+    ConnectionError,
+)
+_TIMEOUT_ERRORS = (requests.Timeout, asyncio.TimeoutError, TimeoutError)
+
+def is_transient(exc: BaseException) -> bool:
+    """Worth retrying: rate limits, server errors, dropped connections and timeouts."""
+    status = error_status(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(exc, _NETWORK_ERRORS + _TIMEOUT_ERRORS)
+
+def _is_transient_quick(exc: BaseException) -> bool:
+    # Page fetches already wait up to their full timeout; retrying one would multiply it
+    return is_transient(exc) and not isinstance(exc, _TIMEOUT_ERRORS)
+
+# Three attempts with jittered exponential backoff (0.5s, 1s, ... capped at 8s); the last
+# error is re-raised unchanged so callers' existing handling still applies
+retry_transient = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=0.5, max=8),
+    retry=retry_if_exception(is_transient),
+    reraise=True,
+)
+retry_transient_quick = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=0.5, max=8),
+    retry=retry_if_exception(_is_transient_quick),
+    reraise=True,
+)
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failed calls and rejects calls for `cooldown`
+    seconds, so a provider that is down fails fast instead of being hammered by every node.
+    After the cooldown a single call is let through as a probe while the rest keep failing
+    fast; its outcome closes or re-opens the circuit. Only transient errors count as
+    failures; a rejected request (e.g. 400) says nothing about provider health.
+    """
+
+    def __init__(self, name: str, threshold: int = 5, cooldown: float = 30.0):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    def check(self) -> None:
+        if self.opened_at is None:
+            return
+        if self.probing or time.monotonic() - self.opened_at < self.cooldown:
+            raise CircuitOpenError(f"{self.name} circuit open after {self.failures} consecutive failures")
+        self.probing = True  # half-open: this caller is the probe
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probing = False
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    def _failed(self, exc: BaseException) -> None:
+        if is_transient(exc):
+            self.record_failure()
+        elif self.probing:
+            # A rejected request still proves the provider answers; a cancelled probe proves nothing
+            if isinstance(exc, Exception):
+                self.record_success()
+            else:
+                self.probing = False
+
+    def __call__(self, fn: Callable) -> Callable:
+        """Decorator for sync or async callables; one failed call (after retries) counts once."""
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                self.check()
+                try:
+                    result = await fn(*args, **kwargs)
+                except BaseException as exc:
+                    self._failed(exc)
+                    raise
+                self.record_success()
+                return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            self.check()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as exc:
+                self._failed(exc)
+                raise
+            self.record_success()
+            return result
+        return wrapper
+
+# One breaker per external provider, shared by its sync and async call sites
+tavily_breaker = CircuitBreaker("tavily")
+llm_breaker = CircuitBreaker("llm")
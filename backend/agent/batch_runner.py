@@ -0,0 +1,74 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Union
+from langchain_groq import ChatGroq
+
+from agent.orchestrator import OrchestratorState, arun_orchestrator
+
+class BatchProcessor:
+    """
+    Runs one coroutine per item with bounded concurrency and a per-minute start rate.
+    Items are not retried here: call_llm already retries 429s with backoff, and re-running
+    a whole pipeline on top would multiply provider calls and trip the shared llm breaker.
+    """
+
+    def __init__(self, max_concurrency: int = 10, rate_limit: int = 100):
+        self.max_concurrency = max_concurrency
+        self.rate_limit = rate_limit  # item starts per minute
+
+    async def _throttle(self, state: dict) -> None:
+        # Space starts evenly so bursts stay under the per-minute limit
+        interval = 60.0 / self.rate_limit
+        async with state["lock"]:
+            now = time.monotonic()
+            wait = state["next_start"] - now
+            state["next_start"] = max(now, state["next_start"]) + interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _run_one(self, fn: Callable[[Any], Awaitable[Any]], item: Any, state: dict) -> Any:
+        async with state["semaphore"]:
+            await self._throttle(state)
+            return await fn(item)
+
+    async def run(
+        self,
+        fn: Callable[[Any], Awaitable[Any]],
+        items: Iterable[Any],
+        return_exceptions: bool = False,
+    ) -> List[Any]:
+        # Loop-bound primitives are created per run so a processor can be reused across loops
+        state = {
+            "semaphore": asyncio.Semaphore(self.max_concurrency),
+            "lock": asyncio.Lock(),
+            "next_start": 0.0,
+        }
+        return await asyncio.gather(
+            *(self._run_one(fn, item, state) for item in items),
+            return_exceptions=return_exceptions,
+        )
+
+async def arun_orchestrator_batch(
+    tasks: List[str],
+    llm: Optional[ChatGroq] = None,
+    use_web: bool = True,
+    processor: Optional[BatchProcessor] = None,
+) -> List[Union[OrchestratorState, Exception]]:
+    """
+    Plan many tasks concurrently. Results keep the order of tasks; a task that fails
+    comes back as its exception instead of aborting the whole batch.
+    """
+    processor = processor or BatchProcessor()
+    return await processor.run(
+        lambda task: arun_orchestrator(task, llm, use_web=use_web),
+        tasks,
+        return_exceptions=True,
+    )
+
+def run_orchestrator_batch(
+    tasks: List[str],
+    llm: Optional[ChatGroq] = None,
+    use_web: bool = True,
+    processor: Optional[BatchProcessor] = None,
+) -> List[Union[OrchestratorState, Exception]]:
+    return asyncio.run(arun_orchestrator_batch(tasks, llm, use_web=use_web, processor=processor))
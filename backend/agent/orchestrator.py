@@ -1,214 +1,261 @@
-import json
-from typing import Any, Dict, List, TypedDict
+import asyncio
+import time
+from functools import lru_cache
+from typing import Callable, List, Optional
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph, END
-from langchain.schema import SystemMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
 from langchain_groq import ChatGroq
 
-from agent.planner_agent import planner_node
+from agent._jsonutil import pretty
+from agent._llm import default_llm_identity, get_llm, llm_from_config, llm_identity, stream_llm
+from agent._logs import append_log, new_log_buffer
+from agent.plan_schema import validate_plan
+from agent.planner_agent import planner_node, planner_plus_research_node
 from agent.reviewer_agent import reviewer_node
+from agent.state import OrchestratorState
+from cache import template_cache
 from retrieval.research_web import researcher_web_node
 
-# ----- Shared State -----
-class OrchestratorState(TypedDict, total=False):
-    task: str
-    plan: Dict[str, Any]
-    research: Dict[str, Any]
-    report_markdown: str
-    logs: List[str]
-    _llm: Any
-    web_sources: List[Dict[str, Any]]
-    # internal control flags/counters
-    validated: bool
-    review_attempts: int
-    max_review_attempts: int
-
-def _append_log(state: OrchestratorState, line: str) -> None:
-    state.setdefault("logs", []).append(line)
-
-def _call_llm(llm: ChatGroq, system_prompt: str, user_prompt: str) -> str:
-    msg = llm.invoke([SystemMessage(content=system_prompt), HumanMessage(content=user_prompt)])
-    return msg.content.strip()
-
 # ----- Lightweight plan validator (no-LLM, prevents infinite loops) -----
-def _plan_issues(plan: Dict[str, Any], task: str) -> List[str]:
-    issues: List[str] = []
-    if not isinstance(plan, dict) or not plan:
-        return ["plan_missing_or_not_dict"]
-
-    # Required top-level sections
-    if not plan.get("assumptions") or len(plan["assumptions"]) < 3:
-        issues.append("assumptions>=3")
-
-    # Timeline checks
-    timeline = plan.get("timeline") or []
-    if len(timeline) < 4:
-        issues.append("timeline>=4")
-    else:
-        # each phase must have milestones[] and deliverables[]
-        for idx, phase in enumerate(timeline, start=1):
-            if not isinstance(phase, dict):
-                issues.append(f"timeline_phase_{idx}_not_dict")
-                continue
-            if not phase.get("milestones") or not isinstance(phase["milestones"], list):
-                issues.append(f"timeline_phase_{idx}_milestones_missing")
-            if not phase.get("deliverables") or not isinstance(phase["deliverables"], list):
-                issues.append(f"timeline_phase_{idx}_deliverables_missing")
-
-    # If task looks like itinerary/day/week, require more granular timeline
-    lowered = (task or "").lower()
-    if any(w in lowered for w in ["day", "week", "itinerary"]):
-        # require at least 7 entries to discourage oversimplified timelines
-        if len(timeline) < 7:
-            issues.append("timeline_daily_breakdown_required")
-
-    # Workstreams
-    workstreams = plan.get("workstreams") or []
-    if len(workstreams) < 4:
-        issues.append("workstreams>=4")
-    else:
-        names_seen = set()
-        for i, ws in enumerate(workstreams, start=1):
-            if not isinstance(ws, dict):
-                issues.append(f"workstream_{i}_not_dict")
-                continue
-            if not ws.get("tasks") or not isinstance(ws["tasks"], list):
-                issues.append(f"workstream_{i}_tasks_missing")
-            if not ws.get("owner"):
-                issues.append(f"workstream_{i}_owner_missing")
-            if not ws.get("dependencies") or not isinstance(ws["dependencies"], list):
-                issues.append(f"workstream_{i}_dependencies_missing")
-            name = (ws.get("name") or "").strip().lower()
-            if name:
-                if name in names_seen:
-                    issues.append("workstreams_unique")
-                names_seen.add(name)
-
-    # Risks
-    risks = plan.get("risks") or []
-    if len(risks) < 4:
-        issues.append("risks>=4")
-    else:
-        seen = set()
-        for i, r in enumerate(risks, start=1):
-            if not isinstance(r, dict):
-                issues.append(f"risk_{i}_not_dict")
-                continue
-            risk_name = (r.get("risk") or "").strip().lower()
-            if not risk_name:
-                issues.append(f"risk_{i}_name_missing")
-            if risk_name in seen:
-                issues.append("risks_diverse")
-            seen.add(risk_name)
-            if not r.get("impact"):
-                issues.append(f"risk_{i}_impact_missing")
-            if not r.get("mitigation"):
-                issues.append(f"risk_{i}_mitigation_missing")
-
-    # Metrics
-    if not plan.get("metrics") or len(plan["metrics"]) < 3:
-        issues.append("metrics>=3")
-
-    return issues
-
 def validator_node(state: OrchestratorState) -> OrchestratorState:
-    """Pure-Python gate to stop infinite planner<->reviewer loops."""
+    """No-LLM gate: only invalid plans go to the reviewer, and the retry limit stops the loop."""
     plan = state.get("plan") or {}
     task = state.get("task", "")
-    issues = _plan_issues(plan, task)
+    issues = validate_plan(plan, task)
 
     if issues:
-        attempts = int(state.get("review_attempts", 0)) + 1
+        attempts = int(state.get("review_attempts", 0))
         max_attempts = int(state.get("max_review_attempts", 3))
-        _append_log(
+        append_log(
             state,
-            f"Validator: plan still has issues -> {', '.join(issues)} (attempt {attempts}/{max_attempts})."
+            f"Validator: plan has issues -> {', '.join(issues)} (reviews so far {attempts}/{max_attempts})."
         )
-        return {"validated": False, "review_attempts": attempts}
+        return {"validated": False, "issues": issues}
     else:
-        _append_log(state, "Validator: plan passed structural checks.")
-        return {"validated": True}
+        append_log(state, "Validator: plan passed structural checks.")
+        return {"validated": True, "issues": []}
+
+def _review_done(state: OrchestratorState) -> bool:
+    # Valid plan, or hard stop at the retry limit
+    if state.get("validated", False):
+        return True
+    return int(state.get("review_attempts", 0)) >= int(state.get("max_review_attempts", 3))
+
+async def review_loop_node(state: OrchestratorState, config: RunnableConfig) -> OrchestratorState:
+    """
+    Validator/reviewer loop as one node, so it is a single branch next to the researcher:
+    LangGraph finishes a whole superstep before starting the next, and separate validator
+    and reviewer nodes would make the first review wait for the researcher to finish.
+    """
+    update: OrchestratorState = {}
+    while True:
+        update.update(validator_node({**state, **update}))
+        if _review_done({**state, **update}):
+            return update
+        update.update(await reviewer_node({**state, **update}, config))
 
 # ----- Reporter -----
-def reporter_node(state: OrchestratorState) -> OrchestratorState:
-    llm: ChatGroq = state["_llm"]
-    _append_log(state, "Reporter: compiling final report with citations (Markdown).")
+# Prepended when the model's report doesn't open with a Markdown heading
+_REPORT_HEADING = "# Project Plan\n\n"
+
+_REPORTER_SYSTEM_PROMPT = (
+    "You are the Reporter Agent. Merge the plan and research into a polished, executive-ready Markdown report. "
+    "Include sections: Overview, Assumptions, Timeline (table), Workstreams, Risks & Mitigations, "
+    "Resources & Tools, Estimates, Validation Checklists, Open Questions, Next Steps, and a Sources section with citations. "
+    "Append the SOURCES at the end as a list with [n] labels. "
+    "Do not invent facts; when unsure, keep it generic."
+)
+
+async def reporter_node(state: OrchestratorState, config: RunnableConfig) -> OrchestratorState:
+    llm: ChatGroq = llm_from_config(config)
+    append_log(state, "Reporter: compiling final report with citations (Markdown).")
 
     citations_md = ""
     if state.get("web_sources"):
         citations_md = "\n\n**Sources**\n" + "\n".join(
-            [f"[{i+1}] {s['title']} — {s['url']}" for i, s in enumerate(state["web_sources"])]
+            f"[{i+1}] {s.title} — {s.url}" for i, s in enumerate(state["web_sources"])
         )
 
-    system = (
-        "You are the Reporter Agent. Merge the plan and research into a polished, executive-ready Markdown report. "
-        "Include sections: Overview, Assumptions, Timeline (table), Workstreams, Risks & Mitigations, "
-        "Resources & Tools, Estimates, Validation Checklists, Open Questions, Next Steps, and a Sources section with citations. "
-        "Do not invent facts; when unsure, keep it generic."
-    )
+    # Section list and citation rules are static (system); only this run's data goes in the user turn
     user = f"""
 PLAN:
-{json.dumps(state['plan'], ensure_ascii=False, indent=2)}
+{pretty(state['plan'])}
 
 RESEARCH:
-{json.dumps(state.get('research', {}), ensure_ascii=False, indent=2)}
+{pretty(state.get('research', {}))}
 
-SOURCES (append at end as a list with [n] labels):
+SOURCES:
 {citations_md}
 """
-    md = _call_llm(llm, system, user)
+    # Streamed so callers using stream_mode="messages" get tokens as they are generated
+    md = await stream_llm(llm, _REPORTER_SYSTEM_PROMPT, user)
     if not md.strip().startswith("#"):
-        md = "# Project Plan\n\n" + md
-    _append_log(state, "Reporter: report assembled.")
+        md = _REPORT_HEADING + md
+    append_log(state, "Reporter: report assembled.")
     return {"report_markdown": md}
 
 # ----- Graph Builder -----
-def build_graph(use_web: bool = True):
+def build_graph(use_web: bool = True, checkpointer: Optional[BaseCheckpointSaver] = None):
+    # State holds only plain data (the LLM comes in through config), so any checkpointer can
+    # persist it. Progress logs are appended in place and only live on the in-memory state.
     graph = StateGraph(OrchestratorState)
 
     # Nodes
-    graph.add_node("planner", planner_node)
-    graph.add_node("reviewer", reviewer_node)
-    graph.add_node("validator", validator_node)
-    graph.add_node("researcher", researcher_web_node if use_web else (lambda s: {"research": {}}))
+    # Without web sources the research notes need only the task, so one fused call
+    # produces both plan and research and there is no separate researcher branch
+    graph.add_node("planner", planner_node if use_web else planner_plus_research_node)
+    graph.add_node("review_loop", review_loop_node)
+    if use_web:
+        graph.add_node("researcher", researcher_web_node)
     graph.add_node("reporter", reporter_node)
 
     # Entry point
     graph.set_entry_point("planner")
 
-    # Linear edges with a gated loop
-    graph.add_edge("planner", "reviewer")
-    graph.add_edge("reviewer", "validator")
-
-    # Validator decides whether to loop or move forward
-    def validation_router(state: OrchestratorState) -> str:
-        if state.get("validated", False):
-            return "researcher"
-        # Hard stop if we hit the retry limit
-        if int(state.get("review_attempts", 0)) >= int(state.get("max_review_attempts", 3)):
-            return "researcher"
-        # Otherwise loop back to planner
-        return "planner"
-
-    graph.add_conditional_edges(
-        "validator",
-        validation_router,
-        {"planner": "planner", "researcher": "researcher"}
-    )
-
-    graph.add_edge("researcher", "reporter")
+    # Fan out: the researcher only needs the draft plan, so it runs concurrently
+    # with the review loop; the reporter waits for both branches
+    graph.add_edge("planner", "review_loop")
+    if use_web:
+        graph.add_edge("planner", "researcher")
+        graph.add_edge(["review_loop", "researcher"], "reporter")
+    else:
+        graph.add_edge("review_loop", "reporter")
     graph.add_edge("reporter", END)
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
+
+@lru_cache(maxsize=2)
+def get_app(use_web: bool = True):
+    """
+    Compiled graph for use_web, built once per process and shared by every run. It holds
+    no per-run data (the LLM comes in through config), so concurrent ainvoke calls on it
+    are safe, e.g. asyncio.gather(*(get_app().ainvoke(state, config) for ...)).
+    """
+    return build_graph(use_web=use_web)
 
-def run_orchestrator(task: str, llm: ChatGroq, use_web: bool = True) -> OrchestratorState:
-    app = build_graph(use_web=use_web)
+class _ChunkCoalescer:
+    """Buffers streamed tokens and hands them on at most once per window (seconds)."""
+
+    def __init__(self, emit: Callable[[str], None], window: float = 0.05):
+        self._emit = emit
+        self._window = window
+        self._buf: List[str] = []
+        self._last = time.monotonic()
+
+    def push(self, text: str) -> None:
+        self._buf.append(text)
+        if time.monotonic() - self._last >= self._window:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buf:
+            self._emit("".join(self._buf))
+            self._buf.clear()
+        self._last = time.monotonic()
+
+async def _run_graph(
+    app,
+    initial: OrchestratorState,
+    config: dict,
+    on_report_chunk: Optional[Callable[[str], None]],
+) -> OrchestratorState:
+    if on_report_chunk is None:
+        return await app.ainvoke(initial, config=config)
+
+    coalescer = _ChunkCoalescer(on_report_chunk)
+    final: OrchestratorState = initial
+    # Hold back leading whitespace until the first real text decides whether the
+    # stream needs the same heading reporter_node adds to the final report
+    head: Optional[List[str]] = []
+    async for mode, payload in app.astream(initial, config=config, stream_mode=["messages", "values"]):
+        if mode == "values":
+            final = payload
+            continue
+        chunk, metadata = payload
+        if metadata.get("langgraph_node") != "reporter" or not isinstance(chunk.content, str):
+            continue
+        if head is None:
+            coalescer.push(chunk.content)
+            continue
+        head.append(chunk.content)
+        text = "".join(head).lstrip()
+        if text:
+            coalescer.push(text if text.startswith("#") else _REPORT_HEADING + text)
+            head = None
+    coalescer.flush()
+    return final
+
+async def arun_orchestrator(
+    task: str,
+    llm: Optional[ChatGroq] = None,
+    use_web: bool = True,
+    on_report_chunk: Optional[Callable[[str], None]] = None,
+    use_template_cache: bool = True,
+) -> OrchestratorState:
+    """
+    Run the full pipeline and return the final state. llm defaults to the process-wide
+    get_llm() client. If on_report_chunk is given, the reporter's Markdown is also passed
+    to it incrementally (~50ms batches) while it is being generated.
+
+    With use_template_cache, a task seen before (after normalization) with the same model
+    is answered from cache.template_cache without running the graph, and validated results
+    are stored.
+
+    Re-entrant: runs share one compiled graph and keep all per-run data in their own
+    state and config, so many can be awaited concurrently.
+    """
+    logs = new_log_buffer()
+    # Cached plans and reports are only valid for the model that wrote them. The default
+    # client's identity comes from config alone, so cache hits need no API key
+    model = llm_identity(llm) if llm is not None else default_llm_identity()
+    if use_template_cache:
+        cached = template_cache.lookup(task, model, use_web)
+        if cached is not None:
+            hit: OrchestratorState = {
+                "task": task,
+                "logs": logs,
+                "plan": cached.plan,
+                "research": cached.research,
+                "report_markdown": cached.report_markdown,
+                "web_sources": cached.web_sources,
+                "validated": True,
+            }
+            append_log(hit, "Orchestrator: served plan, research and report from template cache.")
+            if on_report_chunk is not None:
+                on_report_chunk(cached.report_markdown)
+            return hit
+
+    app = get_app(use_web)
     initial: OrchestratorState = {
         "task": task,
-        "logs": [],
-        "_llm": llm,
+        "logs": logs,
         "validated": False,
         "review_attempts": 0,
         "max_review_attempts": 3,  # change if you want more/less refinement loops
     }
     # Add a reasonable recursion limit to avoid long traces even if misconfigured
-    return app.invoke(initial, config={"recursion_limit": 20})
+    # The LLM is per-invocation config, not state
+    config = {"recursion_limit": 20, "configurable": {"llm": llm if llm is not None else get_llm()}}
+    final = await _run_graph(app, initial, config, on_report_chunk)
+
+    # Only plans that passed validation are worth replaying
+    if use_template_cache and final.get("validated") and final.get("report_markdown"):
+        template_cache.store(task, model, template_cache.CachedPlan(
+            plan=final.get("plan") or {},
+            research=final.get("research") or {},
+            report_markdown=final["report_markdown"],
+            web_sources=final.get("web_sources") or [],
+        ), use_web)
+    return final
+
+def run_orchestrator(
+    task: str,
+    llm: Optional[ChatGroq] = None,
+    use_web: bool = True,
+    on_report_chunk: Optional[Callable[[str], None]] = None,
+    use_template_cache: bool = True,
+) -> OrchestratorState:
+    return asyncio.run(arun_orchestrator(
+        task, llm, use_web=use_web, on_report_chunk=on_report_chunk, use_template_cache=use_template_cache
+    ))
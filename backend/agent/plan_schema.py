@@ -0,0 +1,117 @@
+import re
+from typing import Any, Callable, Dict, List, Tuple
+import fastjsonschema
+
+# ----- Plan schema (single source of truth for reviewer + validator) -----
+_NON_EMPTY_LIST = {"type": "array", "minItems": 1}
+_NON_EMPTY_STR = {"type": "string", "minLength": 1}
+
+_PHASE = {
+    "type": "object",
+    "required": ["milestones", "deliverables"],
+    "properties": {"milestones": _NON_EMPTY_LIST, "deliverables": _NON_EMPTY_LIST},
+}
+_WORKSTREAM = {
+    "type": "object",
+    "required": ["tasks", "owner", "dependencies"],
+    "properties": {
+        "name": {"type": "string"},
+        "tasks": _NON_EMPTY_LIST,
+        "owner": _NON_EMPTY_STR,
+        "dependencies": _NON_EMPTY_LIST,
+    },
+}
+_RISK = {
+    "type": "object",
+    "required": ["risk", "impact", "mitigation"],
+    "properties": {"risk": _NON_EMPTY_STR, "impact": _NON_EMPTY_STR, "mitigation": _NON_EMPTY_STR},
+}
+
+def _min_items(key: str, n: int) -> Dict[str, Any]:
+    return {"type": "object", "required": [key], "properties": {key: {"type": "array", "minItems": n}}}
+
+def _field_rules(item_schema: Dict[str, Any]) -> List[Callable]:
+    """One compiled rule per item field (after an object-type check), so every broken field is reported."""
+    required = set(item_schema.get("required", []))
+    rules = [fastjsonschema.compile({"type": "object"})]
+    for name, prop in item_schema["properties"].items():
+        rule: Dict[str, Any] = {"properties": {name: prop}}
+        if name in required:
+            rule["required"] = [name]
+        rules.append(fastjsonschema.compile(rule))
+    return rules
+
+# fastjsonschema stops at the first error, so each rule is compiled separately to
+# report every failing rule. Section-size rules yield stable issue codes; item rules
+# run per element and field and yield the validator message with the element index
+# (e.g. "timeline[1].milestones must contain ...").
+_COUNT_RULES: List[Tuple[str, Callable]] = [
+    ("assumptions>=3", fastjsonschema.compile(_min_items("assumptions", 3))),
+    ("timeline>=4", fastjsonschema.compile(_min_items("timeline", 4))),
+    ("workstreams>=4", fastjsonschema.compile(_min_items("workstreams", 4))),
+    ("risks>=4", fastjsonschema.compile(_min_items("risks", 4))),
+    ("metrics>=3", fastjsonschema.compile(_min_items("metrics", 3))),
+    ("open_questions_resolved", fastjsonschema.compile({
+        "type": "object",
+        "properties": {"open_questions": {"maxItems": 0, "maxLength": 0, "maxProperties": 0}},
+    })),
+]
+_ITEM_RULES: List[Tuple[str, List[Callable]]] = [
+    ("timeline", _field_rules(_PHASE)),
+    ("workstreams", _field_rules(_WORKSTREAM)),
+    ("risks", _field_rules(_RISK)),
+]
+_DAILY_TIMELINE = fastjsonschema.compile(_min_items("timeline", 7))
+
+_DAILY_TRIGGERS = ["day", "week", "itinerary"]
+# One precompiled alternation scans the task once, however many triggers are added
+_DAILY_TRIGGER_RE = re.compile("|".join(map(re.escape, _DAILY_TRIGGERS)), re.IGNORECASE)
+
+def _has_duplicates(items: Any, key: str) -> bool:
+    if not isinstance(items, list):
+        return False
+    # Non-string names are a type error the item rules already report; skip them here
+    values = (i.get(key) for i in items if isinstance(i, dict))
+    names = [n.strip().lower() for n in values if isinstance(n, str) and n.strip()]
+    return len(set(names)) != len(names)
+
+def validate_plan(plan: Dict[str, Any], task: str = "") -> List[str]:
+    """Return the list of structural issues in plan; empty means the plan is valid."""
+    if not isinstance(plan, dict) or not plan:
+        return ["plan_missing_or_not_dict"]
+
+    issues: List[str] = []
+    for code, check in _COUNT_RULES:
+        try:
+            check(plan)
+        except fastjsonschema.JsonSchemaValueException:
+            issues.append(code)
+
+    # If task looks like itinerary/day/week, require a more granular timeline
+    if _DAILY_TRIGGER_RE.search(task or ""):
+        try:
+            _DAILY_TIMELINE(plan)
+        except fastjsonschema.JsonSchemaValueException:
+            issues.append("timeline_daily_breakdown_required")
+
+    # A missing/non-list section is already reported by the count rules
+    for key, rules in _ITEM_RULES:
+        items = plan.get(key)
+        if not isinstance(items, list):
+            continue
+        for i, item in enumerate(items):
+            for check in rules:
+                try:
+                    check(item)
+                except fastjsonschema.JsonSchemaValueException as e:
+                    issues.append(f"{key}[{i}]{e.message[len('data'):]}")
+                    if not isinstance(item, dict):
+                        break
+
+    # JSON Schema's uniqueItems compares whole objects, so name uniqueness is a set-size check
+    if _has_duplicates(plan.get("workstreams"), "name"):
+        issues.append("workstreams_unique")
+    if _has_duplicates(plan.get("risks"), "risk"):
+        issues.append("risks_diverse")
+
+    return issues
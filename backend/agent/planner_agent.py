@@ -1,106 +1,239 @@
-import json
-from typing import Any, Dict, List, TypedDict
-from langchain.schema import SystemMessage, HumanMessage
+import re
+from typing import Any, Dict, List, Optional, Pattern
+from langchain_core.runnables import RunnableConfig
 from langchain_groq import ChatGroq
 
-class OrchestratorState(TypedDict, total=False):
-    task: str
-    plan: Dict[str, Any]
-    logs: List[str]
-    _llm: Any
-
-def _append_log(state: OrchestratorState, line: str) -> None:
-    state.setdefault("logs", []).append(line)
-
-def _call_llm(llm: ChatGroq, system_prompt: str, user_prompt: str) -> str:
-    msg = llm.invoke([SystemMessage(content=system_prompt), HumanMessage(content=user_prompt)])
-    return msg.content.strip()
-
-def _try_parse_json(text: str):
-    text = text.strip()
-    start = text.find("{")
-    end = text.rfind("}")
-    if start != -1 and end != -1 and end > start:
-        try:
-            return json.loads(text[start:end+1])
-        except Exception:
-            return None
-    return None
+from agent._jsonutil import compact, parse_tolerant
+from agent._llm import call_llm, llm_from_config
+from agent._logs import append_log
+from agent.plan_schema import validate_plan
+from agent.state import OrchestratorState
 
-def _safe_call_planner(llm, system, user, retries=2):
-    out = _call_llm(llm, system, user)
-    data = _try_parse_json(out)
-    if data and all(k in data for k in ["timeline", "workstreams", "risks", "metrics", "assumptions"]):
-        return data
+_REQUIRED_KEYS = ["timeline", "workstreams", "risks", "metrics", "assumptions"]
+
+async def _safe_call_planner(llm, system, user, retries=2):
+    out = await call_llm(llm, system, user)
+    data = parse_tolerant(out)
 
     for _ in range(retries):
+        missing = [k for k in _REQUIRED_KEYS if k not in data] if data else _REQUIRED_KEYS
+        if not missing:
+            return data
+
+        if data:
+            # Partial plan: ask only for the missing sections (a small user turn) and merge them
+            # client-side instead of regenerating the whole plan
+            followup = (
+                f"{user}\n\nThe previous plan was missing keys: {missing}. "
+                "Return ONLY a JSON object with those top-level keys filled in, merging onto:\n"
+                f"{compact(data)}"
+            )
+            patch = parse_tolerant(await call_llm(llm, system, followup, use_cache=False))
+            if patch:
+                data.update({k: patch[k] for k in missing if k in patch})
+            continue
+
         tightened = user + (
             "\n\nREMINDER: You MUST include >=4 timeline entries, >=4 risks, >=3 metrics, "
             "and >=4 workstreams with tasks/owner/dependencies. Output VALID JSON ONLY."
         )
-        out = _call_llm(llm, system, tightened)
-        data = _try_parse_json(out)
-        if data and all(k in data for k in ["timeline", "workstreams", "risks", "metrics", "assumptions"]):
-            return data
-    return None
+        # Retries repeat the same tightened prompt, so always go back to the model
+        out = await call_llm(llm, system, tightened, use_cache=False)
+        data = parse_tolerant(out)
 
-def planner_node(state: OrchestratorState) -> OrchestratorState:
-    llm: ChatGroq = state["_llm"]
-    _append_log(state, "Planner: creating detailed timeline, workstreams, and risks.")
-
-    system = (
-        "You are the Planner Agent. Produce comprehensive, realistic project plans.\n"
-        "Constraints:\n"
-        "- 4–6 timeline phases or weekly buckets, each with 2–4 milestones and deliverables.\n"
-        "- 4–6 workstreams: e.g., Discovery/Research, Execution/Build, QA/Validation, Logistics/Operations, "
-        "Comms/Marketing, Governance/Risk.\n"
-        "- Each workstream: multiple tasks, an owner role, and explicit dependencies.\n"
-        "- >=3 assumptions; >=4 risks (with impact + mitigation); >=3 success metrics.\n"
-        "Output VALID JSON ONLY."
-    )
-
-    user = f"""
-TASK: {state['task']}
-
-Return JSON exactly in this shape:
+    if data and all(k in data for k in _REQUIRED_KEYS):
+        return data
+    return None
 
-{{
+_PLAN_SCHEMA = """{
   "objective": "string",
   "assumptions": ["string", "string", "..."],
   "timeline": [
-    {{
+    {
       "phase": "string",
       "milestones": ["string", "string"],
       "deliverables": ["string", "string"]
-    }}
+    }
   ],
   "workstreams": [
-    {{
+    {
       "name": "string",
       "tasks": ["string", "string"],
       "owner": "Role",
       "dependencies": ["string", "string"]
-    }}
+    }
   ],
   "risks": [
-    {{
+    {
       "risk": "string",
       "impact": "low|medium|high",
       "mitigation": "string"
-    }}
+    }
   ],
   "metrics": ["string", "string", "string"]
-}}
-"""
-    data = _safe_call_planner(llm, system, user)
+}"""
+
+_PLANNER_CONSTRAINTS = (
+    "Constraints:\n"
+    "- 4–6 timeline phases or weekly buckets, each with 2–4 milestones and deliverables.\n"
+    "- 4–6 workstreams: e.g., Discovery/Research, Execution/Build, QA/Validation, Logistics/Operations, "
+    "Comms/Marketing, Governance/Risk.\n"
+    "- Each workstream: multiple tasks, an owner role, and explicit dependencies.\n"
+    "- >=3 assumptions; >=4 risks (with impact + mitigation); >=3 success metrics.\n"
+)
+
+_PLANNER_SYSTEM_PROMPT = (
+    "You are the Planner Agent. Produce comprehensive, realistic project plans.\n"
+    + _PLANNER_CONSTRAINTS
+    + "Output VALID JSON ONLY.\n\n"
+    "Return JSON exactly in this shape:\n\n"
+    + _PLAN_SCHEMA
+)
+
+# Offline research notes: same sections as the web researcher, minus citations
+_RESEARCH_SCHEMA = """{
+  "resources": [{"workstream": "string", "tools": ["..."], "templates": ["..."]}],
+  "estimates": [{"workstream": "string", "effort": "S|M|L", "notes": "string"}],
+  "validation_checklists": [{"workstream": "string", "checklist": ["..."]}],
+  "open_questions": ["...", "..."]
+}"""
+
+_EMPTY_RESEARCH = {"resources": [], "estimates": [], "validation_checklists": [], "open_questions": []}
+
+_PLANNER_PLUS_RESEARCH_SYSTEM_PROMPT = (
+    "You are the Planner Agent. Produce a comprehensive, realistic project plan together with "
+    "research notes for it: resources/tools, estimates, validation checklists, and 5–7 open questions. "
+    "No web sources are available, so keep research notes generic and grounded in common practice.\n"
+    + _PLANNER_CONSTRAINTS
+    + "Output VALID JSON ONLY.\n\n"
+    "Return JSON with two top-level keys, \"plan\" and \"research\":\n\n"
+    "\"plan\" exactly in this shape:\n"
+    + _PLAN_SCHEMA
+    + "\n\n\"research\" exactly in this shape:\n"
+    + _RESEARCH_SCHEMA
+)
+
+def _fallback_plan(task: str) -> Dict[str, Any]:
+    return {
+        "objective": task,
+        "assumptions": ["TBD", "TBD", "TBD"],
+        "timeline": [],
+        "workstreams": [],
+        "risks": [],
+        "metrics": []
+    }
+
+# Short tasks matching an allowlisted pattern (one-off writing chores by default) get a
+# templated plan instead of a planner LLM call; anything else, however short, is planned
+_FAST_PATH_MAX_WORDS = 8
+_PLANNING_KEYWORDS = ("plan", "project", "roadmap")
+_FAST_PATH_PATTERNS: List[Pattern[str]] = [
+    re.compile(
+        r"^\s*(write|draft|compose)\s+(a|an)\s+(short\s+)?"
+        r"(haiku|poem|limerick|tweet|slogan|tagline|thank[- ]you\s+note)\b",
+        re.IGNORECASE,
+    ),
+]
+
+_TEMPLATE_NOTE = (
+    "Templated plan: generated for a short task without the planner model. "
+    "Owners, constraints and risks are placeholders to confirm with the requester."
+)
+
+def register_fast_path(pattern: str) -> None:
+    """Allowlist another kind of short task (regex, case-insensitive) for the templated plan."""
+    _FAST_PATH_PATTERNS.append(re.compile(pattern, re.IGNORECASE))
+
+def _template_plan(task: str) -> Dict[str, Any]:
+    """Neutral scope/do/review/deliver plan for a small task; satisfies validate_plan's counts."""
+    return {
+        "objective": task,
+        "assumptions": [
+            "Scope and expected format are to be confirmed with the requester",
+            "Owner, deadline and any approvals are to be confirmed",
+            "Inputs needed for the task are to be identified during scoping",
+        ],
+        "timeline": [
+            {"phase": "Scope", "milestones": ["Goal and constraints confirmed"], "deliverables": ["Short brief"]},
+            {"phase": "Execute", "milestones": ["First draft complete"], "deliverables": ["Draft output"]},
+            {"phase": "Review", "milestones": ["Feedback collected"], "deliverables": ["Revision notes"]},
+            {"phase": "Deliver", "milestones": ["Final version accepted"], "deliverables": ["Final output"]},
+        ],
+        "workstreams": [
+            {"name": "Scoping", "tasks": ["Clarify goal", "List constraints"], "owner": "To be assigned",
+             "dependencies": ["Task request"]},
+            {"name": "Execution", "tasks": ["Produce draft", "Iterate on draft"], "owner": "To be assigned",
+             "dependencies": ["Scoping"]},
+            {"name": "Quality review", "tasks": ["Check against brief", "Collect feedback"],
+             "owner": "To be assigned", "dependencies": ["Execution"]},
+            {"name": "Delivery", "tasks": ["Apply revisions", "Hand over result"], "owner": "To be assigned",
+             "dependencies": ["Quality review"]},
+        ],
+        "risks": [
+            {"risk": "Requirements not yet confirmed", "impact": "to be assessed",
+             "mitigation": "Confirm the brief before starting"},
+            {"risk": "Scope may grow during the work", "impact": "to be assessed",
+             "mitigation": "Agree what is out of scope up front"},
+            {"risk": "Output may not meet expectations", "impact": "to be assessed",
+             "mitigation": "Review a draft early"},
+            {"risk": "Timing not yet agreed", "impact": "to be assessed",
+             "mitigation": "Set a deadline during scoping"},
+        ],
+        "metrics": ["Delivered by the agreed date", "Meets the confirmed brief", "Requester sign-off"],
+        "notes": _TEMPLATE_NOTE,
+    }
+
+def _fast_path_plan(task: str) -> Optional[Dict[str, Any]]:
+    """Templated plan for a short, allowlisted task, or None when the planner LLM is needed."""
+    if len(task.split()) >= _FAST_PATH_MAX_WORDS:
+        return None
+    task_l = task.lower()
+    if any(kw in task_l for kw in _PLANNING_KEYWORDS):
+        return None
+    if not any(p.search(task) for p in _FAST_PATH_PATTERNS):
+        return None
+    plan = _template_plan(task)
+    # e.g. day/week tasks need a daily timeline the template doesn't have
+    return None if validate_plan(plan, task) else plan
+
+async def planner_node(state: OrchestratorState, config: RunnableConfig) -> OrchestratorState:
+    plan = _fast_path_plan(state["task"])
+    if plan is not None:
+        append_log(state, "Planner: short task; using the templated plan (no LLM call).")
+        return {"plan": plan}
+
+    llm: ChatGroq = llm_from_config(config)
+    append_log(state, "Planner: creating detailed timeline, workstreams, and risks.")
+
+    # Static instructions + schema live in the system prompt so the prefix is
+    # identical across tasks and retries; only the task goes in the user turn.
+    system = _PLANNER_SYSTEM_PROMPT
+    user = f"TASK: {state['task']}"
+    data = await _safe_call_planner(llm, system, user)
     if not data:
-        data = {
-            "objective": state["task"],
-            "assumptions": ["TBD", "TBD", "TBD"],
-            "timeline": [],
-            "workstreams": [],
-            "risks": [],
-            "metrics": []
-        }
-    _append_log(state, "Planner: detailed plan drafted.")
+        data = _fallback_plan(state["task"])
+    append_log(state, "Planner: detailed plan drafted.")
     return {"plan": data}
+
+async def planner_plus_research_node(state: OrchestratorState, config: RunnableConfig) -> OrchestratorState:
+    """
+    Offline (use_web=False) entry node: plan and research notes come back from one LLM call,
+    since without web sources the research step needs nothing but the plan itself.
+    """
+    llm: ChatGroq = llm_from_config(config)
+    append_log(state, "Planner: creating detailed plan and research notes in one call.")
+
+    user = f"TASK: {state['task']}"
+    data = parse_tolerant(await call_llm(llm, _PLANNER_PLUS_RESEARCH_SYSTEM_PROMPT, user)) or {}
+    plan = data.get("plan")
+    research = data.get("research")
+
+    if not isinstance(plan, dict) or any(k not in plan for k in _REQUIRED_KEYS):
+        # Fused answer unusable: fall back to the plan-only prompt and its repair retries
+        append_log(state, "Planner: combined response incomplete; retrying plan only.")
+        plan = await _safe_call_planner(llm, _PLANNER_SYSTEM_PROMPT, user) or _fallback_plan(state["task"])
+    if not isinstance(research, dict):
+        research = dict(_EMPTY_RESEARCH)
+
+    append_log(state, "Planner: detailed plan and research notes drafted.")
+    return {"plan": plan, "research": research}
@@ -0,0 +1,18 @@
+from typing import Any, Deque, Dict, List, TypedDict
+
+from retrieval.websearch import WebSource
+
+# ----- Shared State -----
+# Single definition used by the graph, every node and the CLI
+class OrchestratorState(TypedDict, total=False):
+    task: str
+    plan: Dict[str, Any]
+    research: Dict[str, Any]
+    report_markdown: str
+    logs: Deque[str]
+    web_sources: List[WebSource]  # for citations
+    # internal control flags/counters
+    validated: bool
+    issues: List[str]
+    review_attempts: int
+    max_review_attempts: int
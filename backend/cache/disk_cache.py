@@ -0,0 +1,51 @@
+import zlib
+from typing import Dict, Optional
+import diskcache
+
+class TTLCache:
+    """
+    String cache on diskcache with per-entry expiry and hit/miss counters. The store is
+    opened on first use; disk errors degrade to cache misses. With compress, values are
+    zlib-compressed on disk (worth it for page text, not for short LLM answers).
+    """
+
+    def __init__(self, directory: str, ttl: int, compress: bool = False):
+        self.directory = directory
+        self.ttl = ttl
+        self.compress = compress
+        self.hits = 0
+        self.misses = 0
+        self._store: Optional[diskcache.Cache] = None
+
+    def _cache(self) -> diskcache.Cache:
+        if self._store is None:
+            self._store = diskcache.Cache(self.directory)
+        return self._store
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            value = self._cache().get(key)
+            if value is not None and self.compress:
+                value = zlib.decompress(value).decode("utf-8")
+        except Exception:
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        try:
+            stored = zlib.compress(value.encode("utf-8")) if self.compress else value
+            self._cache().set(key, stored, expire=self.ttl)
+        except Exception:
+            pass
+
+    def clear(self) -> None:
+        self._cache().clear()
+        self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
@@ -0,0 +1,16 @@
+import hashlib
+import os
+import orjson
+
+from cache.disk_cache import TTLCache
+
+# Disk-backed LLM response cache, shared by every process using the same directory
+LLM_CACHE_DIR = os.environ.get("LLM_CACHE_DIR", ".llm_cache")
+LLM_CACHE_TTL = 24 * 3600  # seconds
+
+def cache_key(model: str, temperature: str, system_prompt: str, user_prompt: str) -> str:
+    payload = {"m": model, "t": temperature, "s": system_prompt, "u": user_prompt}
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+# sha256(model, temperature, system, user) -> response text
+llm_cache = TTLCache(LLM_CACHE_DIR, LLM_CACHE_TTL)
@@ -0,0 +1,63 @@
+import hashlib
+from contextlib import closing
+import os
+import re
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+import msgspec
+
+from retrieval.websearch import WebSource
+
+# Finished runs keyed on the normalized task, so recurring requests skip the whole pipeline
+TEMPLATE_CACHE_PATH = os.environ.get("TEMPLATE_CACHE_PATH", ".template_cache.sqlite")
+TEMPLATE_CACHE_TTL = 7 * 24 * 3600  # seconds
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+
+class CachedPlan(msgspec.Struct):
+    plan: Dict[str, Any]
+    research: Dict[str, Any]
+    report_markdown: str
+    web_sources: List[WebSource] = []
+
+def normalize_task(task: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace so trivial rewordings share a key."""
+    return " ".join(_PUNCT_RE.sub(" ", task.lower()).split())
+
+def _key(task: str, use_web: bool, model: str) -> str:
+    # Web and offline runs produce different research, and each model its own plan and
+    # report, so none of them share an entry
+    raw = f"{use_web}\x00{model}\x00{normalize_task(task)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(TEMPLATE_CACHE_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS templates (key TEXT PRIMARY KEY, created REAL NOT NULL, payload BLOB NOT NULL)"
+    )
+    return conn
+
+def lookup(task: str, model: str, use_web: bool = True) -> Optional[CachedPlan]:
+    """Cached result for task and model, or None on a miss, an expired entry or an unreadable cache."""
+    try:
+        # `with conn` only commits/rolls back; closing() releases the connection on any exit
+        with closing(_connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT payload FROM templates WHERE key = ? AND created >= ?",
+                (_key(task, use_web, model), time.time() - TEMPLATE_CACHE_TTL),
+            ).fetchone()
+        return msgspec.json.decode(row[0], type=CachedPlan) if row else None
+    except (sqlite3.Error, msgspec.DecodeError):
+        return None
+
+def store(task: str, model: str, entry: CachedPlan, use_web: bool = True) -> None:
+    """Best effort: a cache write failure never fails the run."""
+    try:
+        with closing(_connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO templates (key, created, payload) VALUES (?, ?, ?)",
+                (_key(task, use_web, model), time.time(), msgspec.json.encode(entry)),
+            )
+    except sqlite3.Error:
+        pass
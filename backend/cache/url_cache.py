@@ -0,0 +1,9 @@
+import os
+
+from cache.disk_cache import TTLCache
+
+# Extracted page text per URL, so repeated research runs replay without the network
+URL_CACHE_DIR = os.environ.get("URL_CACHE_DIR", ".url_cache")
+URL_CACHE_TTL = 24 * 3600  # seconds
+
+url_cache = TTLCache(URL_CACHE_DIR, URL_CACHE_TTL, compress=True)
@@ -1,12 +1,36 @@
-import json
-from typing import Dict, Any, List
-from langchain.schema import SystemMessage, HumanMessage
+import asyncio
+import hashlib
+import re
+from dataclasses import replace
+from typing import Dict, Any, Iterator, List, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from langchain_core.runnables import RunnableConfig
 from langchain_groq import ChatGroq
-from retrieval.websearch import web_research
 
-def _call_llm(llm: ChatGroq, system_prompt: str, user_prompt: str) -> str:
-    msg = llm.invoke([SystemMessage(content=system_prompt), HumanMessage(content=user_prompt)])
-    return msg.content.strip()
+from agent._jsonutil import parse_tolerant, pretty
+from agent._llm import call_llm, llm_from_config
+from agent.state import OrchestratorState
+from retrieval.websearch import (
+    MAX_CONCURRENT_REQUESTS,
+    fetch_sources_async,
+    WebSource,
+    open_session,
+    rank_candidates,
+    tavily_search_async,
+)
+
+# Adaptive fetch depth: fetch the best FIRST_PASS_K pages per query, and only go
+# deeper (TOP_UP_K more) when fewer than MIN_SOURCES distinct sources survive
+_SEARCH_RESULTS = 5
+_FIRST_PASS_K = 2
+_TOP_UP_K = 2
+_MIN_SOURCES = 6
+_MIN_TEXT_CHARS = 200
+# Source text kept per page, for both the summary prompt and the stored web_sources
+_FOCUS_TEXT_CHARS = 4000
+
+# Concurrent per-source summary calls (Groq per-minute limits are the constraint)
+MAX_CONCURRENT_SUMMARIES = 4
 
 def _build_research_queries(task: str, plan: Dict[str, Any]) -> List[str]:
     queries = [f"{task} best practices", f"{task} logistics checklist", f"{task} risk management"]
@@ -21,69 +45,194 @@ def _build_research_queries(task: str, plan: Dict[str, Any]) -> List[str]:
             uniq.append(q); seen.add(q)
     return uniq[:5]
 
-def _summarize_source(llm: ChatGroq, source: Dict[str, str]) -> str:
-    system = (
-        "Summarize the source text in 4–6 factual sentences. "
-        "Do NOT add info not present in the text."
-    )
-    user = f"TITLE: {source['title']}\nURL: {source['url']}\nTEXT:\n{source['text'][:4000]}"
+_TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid"}
+
+def _canonical_url(url: str) -> str:
+    """Lowercase scheme/host, drop fragments and tracking params (utm_*, fbclid, ...)."""
+    parts = urlsplit(url.strip())
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    ]
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", urlencode(query), ""))
+
+def _shingles(text: str, n: int = 5) -> Set[str]:
+    words = text[:1800].lower().split()
+    return {" ".join(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+
+def _dedupe_sources(sources: List[WebSource], threshold: float = 0.85) -> List[WebSource]:
+    """
+    Drop sources without text, exact repeats (same canonical URL + text fingerprint) and
+    near-duplicates (5-shingle Jaccard > threshold, keeping the shortest). Longest first.
+    """
+    exact: Dict[tuple, WebSource] = {}
+    for s in sources:
+        if not s.text:
+            continue
+        key = (_canonical_url(s.url), hashlib.sha1(s.text[:512].encode("utf-8")).hexdigest())
+        exact.setdefault(key, s)
+
+    # Visiting shortest first means the first member of each near-duplicate cluster is kept
+    kept: List[tuple] = []
+    for s in sorted(exact.values(), key=lambda s: len(s.text)):
+        sh = _shingles(s.text)
+        if any(len(sh & other) / len(sh | other) > threshold for other, _ in kept):
+            continue
+        kept.append((sh, s))
+    return sorted((s for _, s in kept), key=lambda s: len(s.text), reverse=True)
+
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+def _keywords(task: str) -> Set[str]:
+    # Words of 3 chars or fewer are mostly stopwords ("the", "for", "a") and match everywhere
+    return {w for w in _WORD_RE.findall(task.lower()) if len(w) > 3}
+
+def _focus_text(text: str, keywords: Set[str], limit: int = _FOCUS_TEXT_CHARS) -> str:
+    """
+    Up to limit chars of text, preferring the paragraphs that mention a task keyword (in page
+    order); the plain leading limit chars when none do. trafilatura keeps paragraph breaks, the
+    BeautifulSoup fallback does not, so single-block text is split into sentences instead.
+    """
+    if len(text) <= limit:
+        return text
+    blocks = [b for b in text.split("\n") if b.strip()]
+    if len(blocks) <= 1:
+        blocks = _SENTENCE_SPLIT_RE.split(text)
+    picked, size = [], 0
+    for b in blocks:
+        if keywords.isdisjoint(_WORD_RE.findall(b.lower())):
+            continue
+        picked.append(b)
+        size += len(b) + 1
+        if size >= limit:
+            break
+    return "\n".join(picked)[:limit] if picked else text[:limit]
+
+_RESEARCH_SYSTEM_PROMPT = (
+    "You are the Web Research Agent. Using the provided sources, synthesize findings into structured JSON: "
+    "resources/tools, estimates, validation checklists, and 5–7 open questions. "
+    "Only include facts grounded in the sources. "
+    "Return VALID JSON ONLY and include citations by listing numeric source IDs.\n\n"
+    "Return JSON exactly with this shape:\n"
+    """{
+  "resources": [{"workstream": "string", "tools": ["..."], "templates": ["..."], "citations": [1,2]}],
+  "estimates": [{"workstream": "string", "effort": "S|M|L", "notes": "string", "citations": [3]}],
+  "validation_checklists": [{"workstream": "string", "checklist": ["..."], "citations": [1,4]}],
+  "open_questions": ["...", "..."],
+  "used_sources": [1,2,3]
+}\n"""
+    "Only JSON. No extra commentary."
+)
+
+_SUMMARY_SYSTEM_PROMPT = (
+    "Summarize the source text in 4–6 factual sentences. "
+    "Do NOT add info not present in the text."
+)
+
+def _snippet_fallback(source: WebSource) -> str:
+    return (source.snippet or source.text)[:500]
+
+async def _summarize_source(llm: ChatGroq, source: WebSource) -> str:
+    user = f"TITLE: {source.title}\nURL: {source.url}\nTEXT:\n{source.text}"
     try:
-        summary = _call_llm(llm, system, user)
+        summary = await call_llm(llm, _SUMMARY_SYSTEM_PROMPT, user)
         return summary.strip()
     except Exception:
-        return (source.get('snippet') or source.get('text', ''))[:500]
+        return _snippet_fallback(source)
+
+async def _search_ranked(session, semaphore: asyncio.Semaphore, query: str) -> List[Dict[str, Any]]:
+    """Tavily candidates for query, best first by score + domain, before any page is fetched."""
+    async with semaphore:
+        results = await tavily_search_async(session, query, max_results=_SEARCH_RESULTS)
+    return rank_candidates(results)
 
-def researcher_web_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    llm: ChatGroq = state["_llm"]
+def _take_unseen(candidates: Iterator[Dict[str, Any]], n: int, seen: Set[str]) -> List[Dict[str, Any]]:
+    """Next n candidates whose canonical URL isn't in seen (which is updated)."""
+    picked: List[Dict[str, Any]] = []
+    for r in candidates:
+        url = _canonical_url(r["url"])
+        if url in seen:
+            continue
+        seen.add(url)
+        picked.append(r)
+        if len(picked) == n:
+            break
+    return picked
+
+async def researcher_web_node(state: OrchestratorState, config: RunnableConfig) -> OrchestratorState:
+    llm: ChatGroq = llm_from_config(config)
     task = state["task"]
     plan = state.get("plan", {})
 
     queries = _build_research_queries(task, plan)
-    sources: List[Dict[str, str]] = []
-    for q in queries:
-        sources.extend(web_research(q, k=3))
+    # Queries are independent, so fetch them concurrently on one shared session
+    async with open_session() as session:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        searched = await asyncio.gather(
+            *(_search_ranked(session, semaphore, q) for q in queries),
+            return_exceptions=True,
+        )
+        # One failed search shouldn't sink the others; only fail if every query did
+        errors = [r for r in searched if isinstance(r, BaseException)]
+        if errors and len(errors) == len(searched):
+            raise errors[0]
+        # Queries share a prefix and often surface the same pages: each URL is fetched once,
+        # by the first query that reaches it; the iterators remember where top-ups resume
+        pending = [iter([] if isinstance(r, BaseException) else r) for r in searched]
+        seen: Set[str] = set()
+        fetched = await asyncio.gather(
+            *(fetch_sources_async(session, _take_unseen(it, _FIRST_PASS_K, seen), semaphore) for it in pending)
+        )
+        sources = [s for batch in fetched for s in batch]
+
+        # Overlapping queries often return the same pages; don't pay tokens for them twice
+        if len(_dedupe_sources(sources)) < _MIN_SOURCES:
+            weak = [
+                i for i, batch in enumerate(fetched)
+                if sum(len(s.text) >= _MIN_TEXT_CHARS for s in batch) < _FIRST_PASS_K
+            ] or range(len(queries))  # nothing thin, just duplicated: deepen every query
+            top_up = await asyncio.gather(*(
+                fetch_sources_async(session, _take_unseen(pending[i], _TOP_UP_K, seen), semaphore)
+                for i in weak
+            ))
+            sources.extend(s for batch in top_up for s in batch)
 
-    filtered = [s for s in sources if s.get("text")]
-    filtered = filtered[:8]
+    # Only the task-relevant part of each page is summarized and kept in state
+    keywords = _keywords(task)
+    filtered = [replace(s, text=_focus_text(s.text, keywords)) for s in _dedupe_sources(sources)[:8]]
 
+    # Summaries are independent LLM calls; run them concurrently, capped for provider rate limits
+    llm_slots = asyncio.Semaphore(MAX_CONCURRENT_SUMMARIES)
+
+    async def summarize(source: WebSource) -> str:
+        async with llm_slots:
+            return await _summarize_source(llm, source)
+
+    results = await asyncio.gather(*(summarize(s) for s in filtered), return_exceptions=True)
     summaries = []
-    for i, s in enumerate(filtered, 1):
-        summary = _summarize_source(llm, s)
+    for i, (s, summary) in enumerate(zip(filtered, results), 1):
+        if isinstance(summary, BaseException):
+            summary = _snippet_fallback(s)
         summaries.append(
-            f"[{i}] TITLE: {s['title']}\nURL: {s['url']}\nSUMMARY:\n{summary}\n"
+            f"[{i}] TITLE: {s.title}\nURL: {s.url}\nSUMMARY:\n{summary}\n"
         )
     context_block = "\n\n".join(summaries)
 
-    system = (
-        "You are the Web Research Agent. Using the provided sources, synthesize findings into structured JSON: "
-        "resources/tools, estimates, validation checklists, and 5–7 open questions. "
-        "Only include facts grounded in the sources. "
-        "Return VALID JSON ONLY and include citations by listing numeric source IDs."
-    )
+    # Instructions + schema are static (system); task, plan and sources go last (user)
     user = f"""
 TASK: {task}
 
 PLAN (JSON):
-{json.dumps(plan, ensure_ascii=False, indent=2)}
+{pretty(plan)}
 
 SOURCES:
 {context_block}
-
-Return JSON exactly with this shape:
-{{
-  "resources": [{{"workstream": "string", "tools": ["..."], "templates": ["..."], "citations": [1,2]}}],
-  "estimates": [{{"workstream": "string", "effort": "S|M|L", "notes": "string", "citations": [3]}}],
-  "validation_checklists": [{{"workstream": "string", "checklist": ["..."], "citations": [1,4]}}],
-  "open_questions": ["...", "..."],
-  "used_sources": [1,2,3]
-}}
-Only JSON. No extra commentary.
 """
-    out = _call_llm(llm, system, user)
+    out = await call_llm(llm, _RESEARCH_SYSTEM_PROMPT, user)
 
-    try:
-        data = json.loads(out[out.find("{"):out.rfind("}")+1])
-    except Exception:
+    data = parse_tolerant(out)
+    if not data:
         data = {
             "resources": [],
             "estimates": [],
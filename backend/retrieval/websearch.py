@@ -1,21 +1,92 @@
+import asyncio
 import os
-import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+import aiohttp
 import requests
-from typing import List, Dict, Any
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlparse
+from bs4 import BeautifulSoup, SoupStrainer
 import trafilatura
 
+from agent._resilience import retry_transient, retry_transient_quick, tavily_breaker
+from cache.url_cache import url_cache
+
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
+TAVILY_URL = "https://api.tavily.com/search"
 
-def tavily_search(query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+# Async fan-out limits: total in-flight requests per research run, and per host
+MAX_CONCURRENT_REQUESTS = 8
+MAX_CONNECTIONS_PER_HOST = 4
+# Default ceiling for any request on a research session without its own timeout
+SESSION_TIMEOUT = 25
+# Tavily "advanced" snippets at least this long are used as the page text without fetching
+SNIPPET_AS_TEXT_CHARS = 800
+
+# HTML beyond this is dropped before parsing, bounding worst-case extraction cost
+MAX_HTML_CHARS = 512_000
+MAX_TEXT_CHARS = 15000
+_TEXT_STRAINER = SoupStrainer(["p", "article", "main", "h1", "h2", "h3", "li"])
+
+def _sync_session() -> requests.Session:
+    # Keep-alive pool for the sync helpers, so repeat hosts skip the TCP/TLS handshake.
+    # No adapter-level retries: retry_transient on the call sites is the only retry layer
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=20, pool_maxsize=20)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+_SESSION = _sync_session()
+
+# Extracted text per URL: an in-process LRU in front of the disk cache (cache.url_cache,
+# 24h TTL). Failed fetches ("") aren't kept at either level.
+URL_TEXT_CACHE_SIZE = 256
+_url_text_cache: "OrderedDict[str, str]" = OrderedDict()
+
+def _memoize_text(url: str, text: str) -> None:
+    _url_text_cache[url] = text
+    _url_text_cache.move_to_end(url)
+    while len(_url_text_cache) > URL_TEXT_CACHE_SIZE:
+        _url_text_cache.popitem(last=False)
+
+def _cached_text(url: str) -> Optional[str]:
+    text = _url_text_cache.get(url)
+    if text is not None:
+        _url_text_cache.move_to_end(url)
+        return text
+    text = url_cache.get(url)
+    if text is not None:
+        _memoize_text(url, text)
+    return text
+
+def _remember_text(url: str, text: str) -> str:
+    if text:
+        _memoize_text(url, text)
+        url_cache.set(url, text)
+    return text
+
+@dataclass(frozen=True, slots=True)
+class WebSource:
     """
-    Call Tavily Search API and return normalized results:
-    [{ 'title': str, 'url': str, 'content': str, 'score': float }]
+    One fetched search result; immutable so it can be shared across queries and dedupe sets.
+    A dataclass rather than a msgspec Struct so LangGraph checkpointers can serialize it.
     """
+    title: str
+    url: str
+    text: str
+    snippet: str = ""
+    score: float = 0.0  # Tavily relevance score
+
+def _web_source(r: Dict[str, Any], text: str) -> WebSource:
+    return WebSource(title=r["title"], url=r["url"], text=text, snippet=r.get("content", ""), score=r.get("score", 0.0))
+
+def _tavily_payload(query: str, max_results: int) -> Dict[str, Any]:
     if not TAVILY_API_KEY:
         raise RuntimeError("TAVILY_API_KEY is not set in environment.")
-    url = "https://api.tavily.com/search"
-    payload = {
+    return {
         "api_key": TAVILY_API_KEY,
         "query": query,
         "search_depth": "advanced",
@@ -26,9 +97,8 @@ def tavily_search(query: str, max_results: int = 5) -> List[Dict[str, Any]]:
         "include_domains": [],
         "exclude_domains": [],
     }
-    resp = requests.post(url, json=payload, timeout=30)
-    resp.raise_for_status()
-    data = resp.json()
+
+def _normalize_tavily(data: Dict[str, Any]) -> List[Dict[str, Any]]:
     cleaned = []
     for r in data.get("results", []):
         cleaned.append({
@@ -39,72 +109,203 @@ def tavily_search(query: str, max_results: int = 5) -> List[Dict[str, Any]]:
         })
     return cleaned
 
+@tavily_breaker
+@retry_transient
+def tavily_search(query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+    """
+    Call Tavily Search API and return normalized results:
+    [{ 'title': str, 'url': str, 'content': str, 'score': float }]
+    """
+    payload = _tavily_payload(query, max_results)
+    resp = _SESSION.post(TAVILY_URL, json=payload, timeout=30)
+    resp.raise_for_status()
+    return _normalize_tavily(resp.json())
+
+@tavily_breaker
+@retry_transient
+async def tavily_search_async(session: aiohttp.ClientSession, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+    """
+    Async variant of tavily_search on a shared aiohttp session.
+    """
+    payload = _tavily_payload(query, max_results)
+    async with session.post(TAVILY_URL, json=payload, timeout=aiohttp.ClientTimeout(total=30)) as resp:
+        resp.raise_for_status()
+        data = await resp.json()
+    return _normalize_tavily(data)
+
+def _soup_text(html: str) -> str:
+    # lxml builds only the content tags; head, nav, etc. are never turned into a tree
+    soup = BeautifulSoup(html[:MAX_HTML_CHARS], "lxml", parse_only=_TEXT_STRAINER)
+    for tag in soup(["script", "style", "noscript"]):
+        tag.extract()
+    # Stop walking the tree once the 15k-char budget is covered
+    parts, size = [], 0
+    for text in soup.stripped_strings:
+        parts.append(text)
+        size += len(text) + 1
+        if size >= MAX_TEXT_CHARS:
+            break
+    return " ".join(" ".join(parts).split())[:MAX_TEXT_CHARS]
+
+def _extract_text(html: str) -> str:
+    """
+    Extract readable text from raw HTML using trafilatura; fallback to BeautifulSoup.
+    """
+    html = html[:MAX_HTML_CHARS]
+    try:
+        extracted = trafilatura.extract(html, include_comments=False, include_tables=False)
+        if extracted and extracted.strip():
+            return extracted.strip()
+    except Exception:
+        pass
+    try:
+        return _soup_text(html)
+    except Exception:
+        return ""
+
 def fetch_url_text(url: str, timeout: int = 25) -> str:
     """
     Fetch and extract readable text using trafilatura; fallback to BeautifulSoup.
     """
+    cached = _cached_text(url)
+    if cached is not None:
+        return cached
+    return _remember_text(url, _download_text(url, timeout))
+
+def _download_text(url: str, timeout: int) -> str:
     try:
         downloaded = trafilatura.fetch_url(url, timeout=timeout)
-        if downloaded:
-            extracted = trafilatura.extract(downloaded, include_comments=False, include_tables=False)
-            if extracted and extracted.strip():
-                return extracted.strip()
     except Exception:
-        pass
+        downloaded = None
+    if downloaded:
+        # Same HTML cap and BeautifulSoup fallback as the async path
+        return _extract_text(downloaded)
 
     try:
-        r = requests.get(url, timeout=timeout, headers={"User-Agent": "Mozilla/5.0"})
+        return _soup_text(_get_html(url, timeout))
+    except Exception:
+        return ""
+
+@retry_transient_quick
+def _get_html(url: str, timeout: int) -> str:
+    r = _SESSION.get(url, timeout=timeout, headers={"User-Agent": "Mozilla/5.0"})
+    r.raise_for_status()
+    return r.text
+
+@retry_transient_quick
+async def _get_html_async(session: aiohttp.ClientSession, url: str, timeout: int) -> str:
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as r:
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-        for tag in soup(["script", "style", "noscript"]):
-            tag.extract()
-        text = " ".join(soup.get_text(separator=" ").split())
-        return text[:15000]
+        return await r.text(errors="ignore")
+
+async def fetch_url_text_async(session: aiohttp.ClientSession, url: str, timeout: int = 25) -> str:
+    """
+    Async variant of fetch_url_text: download on the shared session, extract in a worker thread.
+    """
+    cached = _cached_text(url)
+    if cached is not None:
+        return cached
+    try:
+        html = await _get_html_async(session, url, timeout)
     except Exception:
         return ""
+    # Extraction is CPU-bound; keep it off the event loop
+    return _remember_text(url, await asyncio.to_thread(_extract_text, html))
 
+# Suffix matches on the hostname only, so "notorg.com" or a path containing ".gov" never score
+_TLD_BONUS = (".gov", ".edu", ".ac.uk", ".org")
+_DOMAIN_BONUS = ("hbr.org", "nasa.gov", "who.int", "oecd.org", "un.org", "mit.edu", "stanford.edu")
+
+@lru_cache(maxsize=1024)
 def _domain_score(url: str) -> float:
     """
-    Lightweight domain heuristic: boost .org/.edu/.gov and known reputable domains.
+    Lightweight domain heuristic: boost .org/.edu/.gov/academic hosts and known reputable domains.
+    Memoized: the same URLs come back across queries and both ranking passes.
     """
-    url_l = url.lower()
+    try:
+        host = (urlparse(url).hostname or "").lower()
+    except ValueError:
+        return 0.0
     bonus = 0.0
-    if any(t in url_l for t in [".gov", ".edu", ".ac.", ".org"]):
+    # ".ac." as a whole label covers academic second-level domains (ox.ac.uk, u-tokyo.ac.jp)
+    if host.endswith(_TLD_BONUS) or ".ac." in host:
         bonus += 0.5
-    if any(t in url_l for t in ["hbr.org", "nasa.gov", "who.int", "oecd.org", "un.org", "mit.edu", "stanford.edu"]):
+    if any(host == d or host.endswith("." + d) for d in _DOMAIN_BONUS):
         bonus += 0.3
     return bonus
 
-def rerank_results(results: List[Dict[str, Any]], top_k: int = 5) -> List[Dict[str, Any]]:
+def rank_candidates(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Order raw Tavily results by score + domain heuristic, before any page is fetched.
+    """
+    return sorted(results, key=lambda r: r.get("score", 0.0) + _domain_score(r.get("url", "")), reverse=True)
+
+def rerank_results(results: List[WebSource], top_k: int = 5) -> List[WebSource]:
     """
     Rerank by Tavily score + extracted length + domain heuristic.
     """
     ranked = sorted(
         results,
-        key=lambda r: (
-            r.get("score", 0.0) + _domain_score(r.get("url", "")),
-            len(r.get("text", "")),
-        ),
+        key=lambda r: (r.score + _domain_score(r.url), len(r.text)),
         reverse=True,
     )
     return ranked[:top_k]
 
-def web_research(query: str, k: int = 5) -> List[Dict[str, str]]:
-    """
-    High-level helper: search, then fetch each URL content; rerank; return top-k.
-    Output: [{ 'title', 'url', 'snippet', 'text' }, ...]
-    """
-    results = tavily_search(query, max_results=max(5, k * 2))
-    enriched = []
-    for r in results:
-        url = r["url"]
-        text = fetch_url_text(url)
-        enriched.append({
-            "title": r["title"],
-            "url": url,
-            "snippet": r.get("content", ""),
-            "text": text
-        })
-        # Be polite + avoid getting rate-limited
-        time.sleep(0.5)
+def web_research(query: str, k: int = 5) -> List[WebSource]:
+    """
+    High-level helper: search, then fetch each URL content; rerank; return top-k WebSources.
+    Sync wrapper over web_research_async for callers outside an event loop.
+    """
+    return asyncio.run(web_research_async(query, k))
+
+def open_session() -> aiohttp.ClientSession:
+    """
+    Session meant to be shared by every query of one research run; the connector caps
+    connections per host so concurrent fetches don't hammer a single site.
+    """
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit_per_host=MAX_CONNECTIONS_PER_HOST),
+        headers={"User-Agent": "Mozilla/5.0"},
+        timeout=aiohttp.ClientTimeout(total=SESSION_TIMEOUT),
+    )
+
+async def web_research_async(
+    query: str,
+    k: int = 5,
+    session: Optional[aiohttp.ClientSession] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> List[WebSource]:
+    """
+    Async variant of web_research: the search and all page fetches run concurrently on
+    a shared session, bounded by semaphore. Same output shape as web_research.
+    """
+    if session is None:
+        async with open_session() as own_session:
+            return await web_research_async(query, k, own_session, semaphore)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    async with semaphore:
+        results = await tavily_search_async(session, query, max_results=max(5, k * 2))
+    enriched = await fetch_sources_async(session, results, semaphore)
     return rerank_results(enriched, top_k=k)
+
+async def fetch_sources_async(
+    session: aiohttp.ClientSession,
+    results: List[Dict[str, Any]],
+    semaphore: asyncio.Semaphore,
+) -> List[WebSource]:
+    """
+    Fetch page text for Tavily results concurrently (bounded by semaphore). Results whose
+    Tavily snippet is already substantial use it as text and skip the download.
+    Output keeps the order of results.
+    """
+    async def enrich(r: Dict[str, Any]) -> WebSource:
+        content = r.get("content", "")
+        if len(content) >= SNIPPET_AS_TEXT_CHARS:
+            return _web_source(r, content)
+        async with semaphore:
+            text = await fetch_url_text_async(session, r["url"])
+        return _web_source(r, text)
+
+    return list(await asyncio.gather(*(enrich(r) for r in results)))